@@ -1,18 +1,22 @@
+import hashlib
+
 import streamlit as st
 import pandas as pd
 from targetscraper.d01_data.load_data import fetch_epmc_articles
 from targetscraper.d03_processing.create_master_table import build_top_targets_from_epmc
 from targetscraper.d04_postprocessing.analysis import analyze_articles, corpus_to_df, per_article_long
-from targetscraper.utils import build_article_id_token
+from targetscraper.utils import build_article_id_tokens, clear_http_cache
 
 def add_article_id_tokens(df_articles: pd.DataFrame) -> pd.DataFrame:
     """
-    Add articleIdToken column to df_articles using the same
-    build_article_id_token logic used in build_top_targets_from_epmc.
+    Add articleIdToken column to df_articles using the same vectorized
+    build_article_id_tokens logic used in build_top_targets_from_epmc.
+    fetch_epmc_articles already precomputes the column, so this is a
+    passthrough unless the frame came from elsewhere.
     """
-    df = df_articles.copy()
-    df["articleIdToken"] = df.apply(build_article_id_token, axis=1)
-    return df
+    if "articleIdToken" in df_articles.columns:
+        return df_articles
+    return df_articles.assign(articleIdToken=build_article_id_tokens(df_articles))
 
 def build_article_id_token_from_row(row: pd.Series) -> str:
     """
@@ -26,7 +30,7 @@ def build_article_id_token_from_row(row: pd.Series) -> str:
 
     # Prefer explicit pmcid / pmid as Europe PMC does
     if source == "PMC" and pmcid:
-        core = pmcid.replace("PMC", "") if pmcid.upper().startswith("PMC") else pmcid
+        core = pmcid[3:] if pmcid.startswith("PMC") else pmcid  # EPMC always uses uppercase 'PMC'
         return f"PMC:{core}"
     if source == "MED" and pmid:
         return f"MED:{pmid}"
@@ -43,26 +47,80 @@ def build_article_id_token_from_row(row: pd.Series) -> str:
 def convert_df_to_csv(df: pd.DataFrame) -> bytes:
     return df.to_csv(index=False).encode("utf-8")
 
+def _hash_articles(df: pd.DataFrame) -> str:
+    """Stable content hash of the articles frame, used as an explicit cache key."""
+    return hashlib.blake2b(
+        pd.util.hash_pandas_object(df, index=True).values.tobytes(),
+        digest_size=16,
+    ).hexdigest()
+
+@st.cache_data(ttl=86400)
+def fetch_articles_cached(query: str, from_year: int, to_year: int, max_results: int) -> pd.DataFrame:
+    """Fetch articles once per (query, years, max_results); EPMC results are stable within a day."""
+    return fetch_epmc_articles(query=query, from_year=from_year, to_year=to_year, max_results=max_results)
+
+@st.cache_data
+def build_df_export(_df_articles: pd.DataFrame, target_name: str,
+                    article_links: list, articles_hash: str) -> pd.DataFrame:
+    """Build the per-target articles export frame once per (articles, target).
+
+    Shared by the Articles-by-Target display and the LLM branch, which used to
+    duplicate this filter/map block and recompute it on every rerun.
+    _df_articles is excluded from Streamlit hashing; articles_hash carries its
+    content identity instead.
+    """
+    df_articles_with_tokens = add_article_id_tokens(_df_articles)
+
+    # Filter to tokens that appear in article_links and attach article_url in one
+    # inner hash-join (pandas probes the small links frame), replacing the previous
+    # isin boolean mask plus separate Series.map over a link dict
+    links_df = pd.DataFrame(article_links, columns=["articleIdToken", "article_url"])
+    df_match = df_articles_with_tokens.merge(links_df, on="articleIdToken", how="inner", copy=False)
+
+    # Base metadata columns (including source and id)
+    base_cols = [
+        "source", "id", "title", "abstract", "pubYear",
+        "pmid", "pmcid", "doi", "primary_url", "articleIdToken",
+    ]
+    base_cols = [c for c in base_cols if c in df_match.columns]
+    return df_match[base_cols].assign(
+        article_id=df_match["articleIdToken"],                  # e.g. MED:41032481
+        article_url=df_match["article_url"],
+        target_name=target_name,
+    )
+
 @st.cache_data
-def build_targets_df(_df_articles: pd.DataFrame, _top_k: int, _query: str, _from_year: int, _to_year: int, _max_results: int) -> pd.DataFrame:
-    """Build cached targets DataFrame from articles + top_k + search params"""
-    top_targets, target_info = build_top_targets_from_epmc(_df_articles, top_k=_top_k)
+def build_targets_df(_df_articles: pd.DataFrame, top_k: int, articles_hash: str) -> pd.DataFrame:
+    """Build cached targets DataFrame from articles + top_k.
+
+    _df_articles is excluded from Streamlit hashing (leading underscore);
+    articles_hash carries its content identity instead, so the cache hits
+    whenever the actual article data and top_k are unchanged and recomputes
+    whenever the data changes — independent of which search params produced it.
+    """
+    top_targets, target_info = build_top_targets_from_epmc(_df_articles, top_k=top_k)
 
 
-    rows = []
+    # Columnar construction: parallel lists -> dict-of-columns with explicit dtypes,
+    # instead of list-of-dicts which forces per-row key hashing and object columns
+    names, accessions, frequencies, uniprot_urls, n_articles, article_links = [], [], [], [], [], []
     for key, count in top_targets:
         info = target_info.get(key, {})
-        n_articles = len(info.get("articles", {}))
-        article_links = list(info.get("articles", {}).items())
-        rows.append({
-            "name": info.get("name", key),
-            "accession": info.get("accession"),
-            "frequency": info.get("frequency", count),
-            "uniprot_url": info.get("uniprot_url"),
-            "n_articles": n_articles,
-            "article_links": article_links,
-        })
-    return pd.DataFrame(rows)
+        articles = info.get("articles", {})
+        names.append(info.get("name", key))
+        accessions.append(info.get("accession"))
+        frequencies.append(info.get("frequency", count))
+        uniprot_urls.append(info.get("uniprot_url"))
+        n_articles.append(len(articles))
+        article_links.append(list(articles.items()))
+    return pd.DataFrame({
+        "name": pd.array(names, dtype="string"),
+        "accession": pd.array(accessions, dtype="string"),
+        "frequency": pd.array(frequencies, dtype="Int32"),
+        "uniprot_url": pd.array(uniprot_urls, dtype="string"),
+        "n_articles": pd.array(n_articles, dtype="Int32"),
+        "article_links": article_links,                     # list of (aid, url) tuples; stays object dtype
+    })
 
 def main():
     st.set_page_config(page_title="Target Explorer - Discovery and Validation", layout="wide")
@@ -94,14 +152,16 @@ def main():
 
         if st.button("🚀 Run search", type="primary", use_container_width=True):
             with st.spinner("Fetching articles and processing targets..."):
-                df_articles = fetch_epmc_articles(
-                    query=query, from_year=int(from_year), to_year=int(to_year), max_results=int(max_results)
+                df_articles = fetch_articles_cached(
+                    query, int(from_year), int(to_year), int(max_results)
                 )
                 st.session_state.df_articles = df_articles
-                # Pass search params to invalidate cache on new searches
+                # Content hash keys the cache, so identical data reuses the targets build
                 st.session_state.df_targets = build_targets_df(
-                    df_articles, int(top_k), query, int(from_year), int(to_year), int(max_results)
+                    df_articles, int(top_k), _hash_articles(df_articles)
                 )
+                st.session_state.name_to_row = None  # Rebuilt lazily for the new targets frame
+                st.session_state.df_display = None   # Sorted view rebuilt lazily for the new targets frame
             st.sidebar.success("✅ Search complete!")
 
     # Article Section
@@ -121,13 +181,14 @@ def main():
     if st.session_state.df_targets is not None:
         st.subheader("🏆 Top targets")
 
-        
-        df_display = st.session_state.df_targets[
-        ["name", "frequency", "n_articles", "uniprot_url", "accession", "article_links"]
-    ].sort_values("n_articles", ascending=False)
-    
+        # Sorted view built once per targets frame instead of re-sorting on every rerun
+        if st.session_state.get("df_display") is None:
+            st.session_state.df_display = st.session_state.df_targets[
+                ["name", "frequency", "n_articles", "uniprot_url", "accession", "article_links"]
+            ].sort_values("n_articles", ascending=False)
+
         st.dataframe(
-            df_display,
+            st.session_state.df_display,
             column_config={
                 "uniprot_url": st.column_config.LinkColumn("UniProt")
     },
@@ -135,59 +196,35 @@ def main():
             use_container_width=True
         )
         
+        # O(1) per-select lookup: name -> row dict, built once per targets frame instead
+        # of a full boolean scan on every selectbox change
+        if st.session_state.get("name_to_row") is None:
+            st.session_state.name_to_row = {
+                r["name"]: r for r in st.session_state.df_targets.to_dict("records")
+            }
+
         st.subheader("📊 Articles by Target")
         selected = st.selectbox("Target", st.session_state.df_targets["name"])
         st.session_state["selected_target"] = selected
 
         if selected:
-            df_targets = st.session_state.df_targets
             df_articles = st.session_state.df_articles
 
-            target_row = df_targets[df_targets["name"] == selected]
-            if not target_row.empty:
-                article_links = target_row.iloc[0]["article_links"]  # list of (aid, url)
+            target_row = st.session_state.name_to_row.get(selected)
+            if target_row is not None:
+                article_links = target_row["article_links"]  # list of (aid, url)
 
                 st.markdown(f"**Articles mentioning {selected}** ({len(article_links)} found)")
-                for aid, url in article_links:
-                    st.markdown(f"[{aid}]({url})")
+                # One markdown element for the whole list: each st.markdown call adds a
+                # separately rendered Streamlit element, which gets slow for long lists
+                st.markdown("\n".join(f"- [{aid}]({url})" for aid, url in article_links))
 
                 # --- Build rich table with both article metadata + original IDs/URLs + source ---
+                df_export = build_df_export(
+                    df_articles, selected, article_links, _hash_articles(df_articles)
+                )
 
-                # 1) Build set of articleIdTokens from article_links (exact aids from annotations)
-                article_ids = [aid for aid, _ in article_links]
-                aid_set = set(article_ids)
-
-                # 2) Add articleIdToken to df_articles using the *same* build_article_id_token
-                df_articles_with_tokens = add_article_id_tokens(df_articles)
-
-                # 3) Filter df_articles by tokens that appear in article_links
-                mask = df_articles_with_tokens["articleIdToken"].isin(aid_set)
-                df_match = df_articles_with_tokens[mask].copy()
-
-                # 4) Base metadata columns (including source and id)
-                base_cols = [
-                    "source",
-                    "id",
-                    "title",
-                    "abstract",
-                    "pubYear",
-                    "pmid",
-                    "pmcid",
-                    "doi",
-                    "primary_url",
-                    "articleIdToken",
-                ]
-                base_cols = [c for c in base_cols if c in df_match.columns]
-                df_export = df_match[base_cols].copy()
-
-                # 5) Map original article_id + article_url from article_links
-                link_map = {aid: url for aid, url in article_links}
-
-                df_export["article_id"] = df_export["articleIdToken"]       # e.g. MED:41032481
-                df_export["article_url"] = df_export["article_id"].map(link_map)
-                df_export["target_name"] = selected
-
-                # 6) Reorder columns nicely
+                # Reorder columns nicely
                 col_order = [
                     "target_name",
                     "source",
@@ -280,33 +317,18 @@ For customization to criteria or tech stack, or deployment at your site, please
             else:
                 with st.spinner("Running Gemini analysis for the selected target..."):
                     # Build df_export (same as earlier) for the selected target
-                    df_targets = st.session_state.df_targets
                     df_articles = st.session_state.df_articles
 
-                    target_row = df_targets[df_targets["name"] == target_for_llm]
-                    if target_row.empty:
+                    target_row = (st.session_state.get("name_to_row") or {}).get(target_for_llm)
+                    if target_row is None:
                         st.error("No matching target found in the targets table.")
                     else:
-                        article_links = target_row.iloc[0]["article_links"]  # list[(aid, url)]
-
-                        # Rebuild df_export as before (can refactor into a helper if you like)
-                        article_ids = [aid for aid, _ in article_links]
-                        aid_set = set(article_ids)
-                        df_articles_with_tokens = add_article_id_tokens(df_articles)
-                        mask = df_articles_with_tokens["articleIdToken"].isin(aid_set)
-                        df_match = df_articles_with_tokens[mask].copy()
-
-                        base_cols = [
-                            "source", "id", "title", "abstract", "pubYear",
-                            "pmid", "pmcid", "doi", "primary_url", "articleIdToken",
-                        ]
-                        base_cols = [c for c in base_cols if c in df_match.columns]
-                        df_export = df_match[base_cols].copy()
-
-                        link_map = {aid: url for aid, url in article_links}
-                        df_export["article_id"] = df_export["articleIdToken"]
-                        df_export["article_url"] = df_export["article_id"].map(link_map)
-                        df_export["target_name"] = target_for_llm
+                        article_links = target_row["article_links"]  # list[(aid, url)]
+
+                        # Same cached helper as the display path, so this is a cache hit
+                        df_export = build_df_export(
+                            df_articles, target_for_llm, article_links, _hash_articles(df_articles)
+                        )
 
                         # Run LLM analysis (limit by max_articles)
                         df_for_llm = df_export[["title", "abstract", "article_id", "target_name"]].rename(
@@ -368,7 +390,7 @@ For customization to criteria or tech stack, or deployment at your site, please
                     with col_a:
                         st.download_button(
                             "📥 Download article-level extraction (CSV)",
-                            data=df_display_articles.to_csv(index=False).encode("utf-8"),
+                            data=convert_df_to_csv(df_display_articles),
                             file_name=f"{target_for_llm.replace(' ', '_')}_article_llm_analysis.csv",
                             mime="text/csv",
                             use_container_width=True,
@@ -376,7 +398,7 @@ For customization to criteria or tech stack, or deployment at your site, please
                     with col_b:
                         st.download_button(
                             "📥 Download corpus-level summary (CSV)",
-                            data=df_corpus.to_csv(index=False).encode("utf-8"),
+                            data=convert_df_to_csv(df_corpus),
                             file_name=f"{target_for_llm.replace(' ', '_')}_corpus_llm_summary.csv",
                             mime="text/csv",
                             use_container_width=True,
@@ -407,8 +429,11 @@ For customization to criteria or tech stack, or deployment at your site, please
             if st.button("🗑️ Clear results"):
                 # Clear cache + session state
                 st.cache_data.clear()
+                clear_http_cache()
                 st.session_state.df_articles = None
                 st.session_state.df_targets = None
+                st.session_state.name_to_row = None
+                st.session_state.df_display = None
                 st.rerun()
 
 if __name__ == "__main__":
@@ -1,13 +1,103 @@
-import requests
+import numpy as np
 import pandas as pd
-from collections import Counter
-from typing import List, Tuple, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any
 from tqdm import tqdm
+from targetscraper.utils import _SESSION, build_article_id_tokens, json_loads
+
+SEARCH_URL = "https://www.ebi.ac.uk/europepmc/webservices/rest/search"  # RestFul API endpoint
+
+
+def _fetch_search_page(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Function to fetch one search results page. Runs on the main thread for the first
+    page (to read hitCount) and on the prefetch thread for the remaining pages.
+
+    Parameters
+    ----------
+    params : Dict[str, Any]
+        Full query params for this page, including "cursorMark".
+
+    Returns
+    -------
+    Dict[str, Any]
+        Parsed JSON response dictionary, or {} on request failure.
+    """
+    response = _SESSION.get(SEARCH_URL, params=params, timeout=30)  # Pooled session: keep-alive + retries
+    if not response.ok:
+        tqdm.write(f"Request failed at cursor {params.get('cursorMark')}: {response.status_code}")
+        return {}
+    return json_loads(response.content)                             # Parse JSON response into a dictionary (orjson when available)
+
+
+_COLUMNS = ["id", "source", "pmid", "pmcid", "doi", "title", "abstract", "pubYear", "primary_url"]
+
+
+def _articles_to_df(articles: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Function to extract one page of article dicts into the output columns, vectorized:
+    pd.json_normalize flattens the page once and primary_url is resolved with a
+    single np.select over the whole page instead of branchy per-article Python.
+
+    Parameters
+    ----------
+    articles : List[Dict[str, Any]]
+        Article dictionaries from one search results page.
+
+    Returns
+    -------
+    pd.DataFrame
+        Page frame with columns ['id', 'source', 'pmid', 'pmcid', 'doi', 'title',
+        'abstract', 'pubYear', 'primary_url'].
+    """
+    df = pd.json_normalize(articles)
+
+    def col(name: str) -> pd.Series:
+        if name in df.columns:
+            return df[name].fillna("").astype(str)
+        return pd.Series([""] * len(df), index=df.index)            # Default "" if key not present on this page
+
+    out = pd.DataFrame({
+        "id": col("id"),
+        "source": col("source"),
+        "pmid": col("pmid"),
+        "pmcid": col("pmcid"),
+        "doi": col("doi"),
+        "title": col("title"),
+        "abstract": col("abstractText") if "abstractText" in df.columns else col("abstract"),
+        "pubYear": col("pubYear"),
+    })
+
+    # First preference : fullTextUrl if available (list column after json_normalize)
+    if "fullTextUrlList.fullTextUrl" in df.columns:
+        ft = pd.Series([x[0].get("url", "") if isinstance(x, list) and x else ""
+                        for x in df["fullTextUrlList.fullTextUrl"]], index=df.index).fillna("")
+    else:
+        ft = pd.Series([""] * len(df), index=df.index)
+
+    # Fallback : canonical links if no full text
+    # PMC123456 → "123456"  → https://europepmc.org/article/PMC/123456
+    # 123456    →            https://europepmc.org/abstract/MED/123456
+    pmcid = out["pmcid"].str.strip()
+    pmid = out["pmid"].str.strip()
+    doi = out["doi"].str.strip()
+    pmc_core = pmcid.str.replace(r"^PMC", "", regex=True)           # Remove leading 'PMC' if present
+    out["primary_url"] = np.select(
+        [ft != "", pmcid != "", pmid != "", doi != ""],
+        [ft,
+         "https://europepmc.org/article/PMC/" + pmc_core,
+         "https://europepmc.org/abstract/MED/" + pmid,
+         "https://doi.org/" + doi],
+        default="",
+    )
+    return out
+
 
 def fetch_epmc_articles(query: str,
                         from_year: int = 2024,
                         to_year: int = 2025,
-                        max_results: int = 2000) -> pd.DataFrame:
+                        max_results: int = 2000,
+                        result_type: str = "core") -> pd.DataFrame:
     
     """Fetches articles from Europe PMC.
     https://europepmc.org/RestfulWebService#!/Europe32PMC32Articles32RESTful32API/search_articles_get
@@ -22,94 +112,84 @@ def fetch_epmc_articles(query: str,
         To year, default 2025
     max_results : int
         Maximum number of results to fetch, default 2000
+    result_type : str
+        Europe PMC resultType, default "core" (full record including abstract, needed
+        for the LLM analysis flow). Pass "lite" for annotation-only flows that don't
+        need abstracts: the payload is 5-10x smaller so pages download and parse much
+        faster, and the 'abstract' column simply comes back empty.
 
     Returns
     -------
     pd.DataFrame
         DataFrame of articles with columns:
-        ['id', 'source', 'pmid', 'pmcid', 'doi', 'title', 'abstract', 'pubYear', 'primary_url']
+        ['id', 'source', 'pmid', 'pmcid', 'doi', 'title', 'abstract', 'pubYear', 'primary_url', 'articleIdToken']
         e.g. 
           id          source    pmid      pmcid  doi                            title                     abstract       pubYear  primary_url
           41366037    MED       41366037         10.1038/s41598-025-31533-w     Network pharmacology...   This study...  2025     https://doi.org/10.1038/s41598-025-31533-w
     """
 
-    url = "https://www.ebi.ac.uk/europepmc/webservices/rest/search" # RestFul API endpoint
-    all_rows = []                                                   # Accumulated results
-    page_size = 1000                                                # Max allowed per page. WebService limits extraction to 1000 per request. Do not increase beyond 1000.
-    page = 0                                                        # To store page number  
-    
-    pbar = tqdm(total=max_results, desc="Fetching articles", unit="articles")
-    
-    while len(all_rows) < max_results:                              # Loop until we reach max_results, default 2000. Increasing this may lead to timeouts.  
-        params = {
-            "query": f"{query} AND PUB_YEAR:[{from_year} TO {to_year}]",
-            "format": "json",
-            "pageSize": page_size,
-            "page": page,
-            "resultType": "core",                                   # core: returns full metadata for a given publication ID; including abstract, full text links, and MeSH terms
-        }
-        
-        response = requests.get(url, params=params, timeout=30)
-        if not response.ok:
-            print(f"Request failed on page {page}: {response.status_code}")
-            break
-            
-        results = response.json()                                  # Parse JSON response into a dictionary 
-        articles = results.get("resultList", {}).get("result", []) # Extract articles and return as a list of dictionaries
-        
-        if not articles:  # No more results
-            break
-            
-        # Process current page
-        for art in articles:                                        # Loop through each article dictionary
-            if len(all_rows) >= max_results:                        # Check if we've reached max_results
+    page_size = 1000                                              # Max allowed per page. WebService limits extraction to 1000 per request. Do not increase beyond 1000.
+
+    base_params = {
+        "query": f"{query} AND PUB_YEAR:[{from_year} TO {to_year}]",
+        "format": "json",
+        "pageSize": page_size,
+        "resultType": result_type,                                  # core: full metadata including abstract, full text links, and MeSH terms; lite: lean payload without abstract
+    }
+
+    # cursorMark paging: constant server-side cost at any depth, unlike integer
+    # page= paging which degrades and eventually errors past a few thousand
+    # results. Cursors force in-order fetching, so instead of a parallel page
+    # fan-out we pipeline one request ahead: page N+1 downloads on the prefetch
+    # thread while page N is parsed and extracted on the main thread.
+    first = _fetch_search_page({**base_params, "cursorMark": "*"})
+    hit_count = first.get("hitCount", 0)                            # Total matches reported by Europe PMC
+    target = min(hit_count, max_results) if hit_count else max_results
+
+    pbar = tqdm(total=target, desc="Fetching articles", unit="articles")
+
+    frames = []                                                     # One extracted frame per page
+    n_rows = 0                                                      # Rows accumulated so far
+    results = first
+    cursor = "*"
+    page = 0
+    with ThreadPoolExecutor(max_workers=1) as executor:             # Single prefetch thread keeps cursor ordering
+        while True:
+            articles = results.get("resultList", {}).get("result", [])  # Extract articles and return as a list of dictionaries
+
+            if not articles:  # No more results
                 break
-        
-            # Extract primary URL of the article
-            primary_url = ""
-            
-            # First preference : fullTextUrl if available 
-            ft_list = art.get("fullTextUrlList", {})                # Get fullTextUrlList dictionary
-            if ft_list and ft_list.get("fullTextUrl"):              # If fullTextUrl key exists
-                first_ft_url = ft_list["fullTextUrl"][0].get("url") # Extract URL
-                if first_ft_url:                                    # If URL is not empty  
-                    primary_url = first_ft_url                      # Set as primary URL       
-            
-            # Fallback : canonical links if no full text
-            if not primary_url:
-                pmcid = (art.get("pmcid") or "").strip()            # Extract PMCID if available
-                pmid = (art.get("pmid") or "").strip()              # Extract PMID if available
-                doi = (art.get("doi") or "").strip()                # Extract DOI if available
-                
-                # PMC123456 → "123456"  → https://europepmc.org/article/PMC/123456
-                # MEDABC123 → "ABC123"  → https://europepmc.org/article/MED/ABC123
-                # 123456    → "123456"  → https://europepmc.org/article/PMC/123456
-
-                if pmcid:
-                    core = pmcid.replace("PMC", "") if pmcid.upper().startswith("PMC") else pmcid
-                    primary_url = f"https://europepmc.org/article/PMC/{core}"
-                elif pmid:
-                    primary_url = f"https://europepmc.org/abstract/MED/{pmid}"
-                elif doi:
-                    primary_url = f"https://doi.org/{doi}"
-            # Collect all relevant fields into a row : extract needed fields from article dictionary with "" as default if key not present 
-            all_rows.append({
-                "id": art.get("id", ""),
-                "source": art.get("source", ""),
-                "pmid": art.get("pmid", ""),
-                "pmcid": art.get("pmcid", ""),
-                "doi": art.get("doi", ""),
-                "title": art.get("title", ""),
-                "abstract": art.get("abstractText", art.get("abstract", "")),
-                "pubYear": art.get("pubYear", ""),
-                "primary_url": primary_url,  
-            })
-        
-        page += 1
-        pbar.update(len(articles))
-        pbar.set_postfix({"page": page, "total": len(all_rows)})
-    
+
+            next_cursor = results.get("nextCursorMark")             # Cursor for the following page; absent/repeated on the last page
+            future = None
+            if next_cursor and next_cursor != cursor and n_rows + len(articles) < target:
+                future = executor.submit(_fetch_search_page,
+                                         {**base_params, "cursorMark": next_cursor})  # Prefetch next page while this one is parsed
+
+            frames.append(_articles_to_df(articles))                # Vectorized extraction of the whole page
+            n_rows += len(articles)
+            pbar.update(len(articles))
+            pbar.set_postfix({"page": page + 1, "total": min(n_rows, max_results)})
+            page += 1
+
+            if future is None:                                      # Target reached or cursor exhausted
+                break
+            cursor = next_cursor
+            results = future.result()
+
     pbar.close()  # Clean up progress bar
-    
-    df = pd.DataFrame(all_rows[:max_results])  # Trim to requested max
+
+    if frames:
+        df = pd.concat(frames, ignore_index=True).iloc[:max_results].reset_index(drop=True)  # Trim to requested max
+    else:
+        df = pd.DataFrame(columns=_COLUMNS)
+    df["articleIdToken"] = build_article_id_tokens(df)              # Precompute once here so downstream consumers don't re-derive it per run
+
+    # Compact dtypes: low-cardinality source as category, pubYear as nullable Int16,
+    # id-like columns as pandas string dtype. Roughly halves memory on large corpora
+    # and speeds up the isin/merge/hashing done downstream.
+    df["source"] = df["source"].astype("category")
+    df["pubYear"] = pd.to_numeric(df["pubYear"], errors="coerce").astype("Int16")
+    for c in ("id", "pmid", "pmcid", "doi", "articleIdToken"):
+        df[c] = df[c].astype("string")
     return df
\ No newline at end of file
@@ -1,14 +1,54 @@
-import requests
-import pandas as pd
-from collections import Counter
-from typing import List, Tuple, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
 from tqdm import tqdm
+from targetscraper.utils import _SESSION, json_loads
 
 ANN_URL = "https://www.ebi.ac.uk/europepmc/annotations_api/annotationsByArticleIds"                             # Annotations API endpoint
 
+MAX_WORKERS = 10                                                                                                # Concurrent annotation requests; keep modest to respect EBI rate limits
+
+def _fetch_chunk(chunk: List[str]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Function to fetch annotations for one chunk of article IDs. Runs inside the thread pool;
+    returns the parsed entry list, or None on request failure.
+
+    Parameters
+    ----------
+    chunk : List[str]
+        Article IDs in the form 'SOURCE:ext_id' for one API call.
+
+    Returns
+    -------
+    Optional[List[Dict[str, Any]]]
+        List of {"source": ..., "extId": ..., "annotations": [...]} entries, or None on error.
+    """
+    params = {
+        "articleIds": ",".join(chunk),
+        "type": "Gene_Proteins",                                 # Filter for gene/protein annotations only
+        "section": "Abstract",                                   # Limit to abstract section to keep managable size and avoid accessing full text
+        "provider": "Europe PMC",                                # Annotations from Europe PMC used. We can also use "OpenTargets" (jointly or standalone) if needed.
+        "format": "JSON",                                        # Request JSON response
+    }
+
+    r = _SESSION.get(ANN_URL, params=params, timeout=60)         # Call Annotations API via pooled session
+    if r.status_code in (413, 414) and len(chunk) > 1:           # Request too large: halve the chunk and retry both halves
+        mid = len(chunk) // 2
+        left = _fetch_chunk(chunk[:mid]) or []
+        right = _fetch_chunk(chunk[mid:]) or []
+        return left + right
+    if not r.ok:                                                 # Check for request errors
+        tqdm.write(f"Annotations API error {r.status_code} for chunk starting at {chunk[0]}: {r.url}")
+        return None
+
+    data = json_loads(r.content)                                 # list of {"articleId": "...", "annotations": [...]} (orjson when available)
+    if isinstance(data, dict):                                   # Handle case where response is a dict with "annotationsByArticle" key
+        data = data.get("annotationsByArticle", [])
+    return data
+
 
 def get_gene_annotations_for_articles(article_ids: List[str],
-                                      chunk_size: int = 8) -> Dict[str, List[Dict[str, Any]]]:
+                                      chunk_size: int = 8,
+                                      max_concurrency: int = MAX_WORKERS) -> Dict[str, List[Dict[str, Any]]]:
 
     """Call annotationsByArticleIds in small chunks to avoid 414 and API limits.
     https://europepmc.org/AnnotationsApi#!/annotations45api45controller/getAnnotationsArticlesByIdsUsingGET
@@ -18,7 +58,12 @@ def get_gene_annotations_for_articles(article_ids: List[str],
     article_ids : List[str]
         List of article IDs in the form 'SOURCE:ext_id' (e.g. 'MED:12345678', 'PMC:87654321')
     chunk_size : int
-        Number of article IDs to include per API call, default 8 which is the maximum allowed. Do not increase beyond 8.
+        Number of article IDs to include per API call, default 8 which is the maximum
+        the API documents for this endpoint. Larger values are safe to experiment
+        with: oversized requests (413/414) fall back to halved chunks automatically.
+    max_concurrency : int
+        Maximum number of chunk requests in flight at once, default MAX_WORKERS.
+        Lower this when sharing the EBI rate budget with other calls.
 
     Returns
     -------
@@ -62,35 +107,27 @@ def get_gene_annotations_for_articles(article_ids: List[str],
     print("Fetching gene annotations for articles...")
     out: Dict[str, List[Dict[str, Any]]] = {}
 
-    # Convert range to list for tqdm
-    chunks = list(range(0, len(article_ids), chunk_size))
-    for start in tqdm(chunks, desc="Processing article ID chunks"):     
-        chunk = article_ids[start:start + chunk_size]
-        params = {
-            "articleIds": ",".join(chunk),
-            "type": "Gene_Proteins",                                 # Filter for gene/protein annotations only
-            "section": "Abstract",                                   # Limit to abstract section to keep managable size and avoid accessing full text
-            "provider": "Europe PMC",                                # Annotations from Europe PMC used. We can also use "OpenTargets" (jointly or standalone) if needed.
-            "format": "JSON",                                        # Request JSON response   
-        }
-   
-        r = requests.get(ANN_URL, params=params, timeout=60)         # Call Annotations API
-        if not r.ok:                                                 # Check for request errors                       
-            tqdm.write(f"Annotations API error {r.status_code} for chunk starting at {start}: {r.url}")
-            continue
-   
-        data = r.json()                                              # list of {"articleId": "...", "annotations": [...]}
-        if isinstance(data, dict):                                   # Handle case where response is a dict with "annotationsByArticle" key
-            data = data.get("annotationsByArticle", [])
-
-        for entry in data:                                           # Process each article
-            source = entry.get("source")                             # e.g. 'MED', 'PMC'
-            ext_id = entry.get("extId")                              # e.g. '12345678', '87654321'
-            if source and ext_id:
-                 aid = f"{source}:{ext_id}"                          # e.g. 'MED:12345678', 'PMC:87654321'
-            else:
-                aid = ext_id or source                               # fallback if one is missing
-            anns = entry.get("annotations", [])                      # List of all annotations for this article
-            gene_anns = [a for a in anns if a.get("type", "").lower().startswith("gene_proteins")] # Filter for gene/protein annotations only
-            out[aid] = gene_anns                                     # Store in output dictionary
+    # Split IDs into chunks upfront so independent requests can run in parallel
+    chunks = [article_ids[start:start + chunk_size] for start in range(0, len(article_ids), chunk_size)]
+
+    # Chunk requests are independent network I/O, so fan them out over a thread pool;
+    # accumulate into `out` on the main thread only, to avoid any locking.
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(chunks) or 1))) as executor:
+        results = tqdm(executor.map(_fetch_chunk, chunks),
+                       total=len(chunks),
+                       desc="Processing article ID chunks")
+        for data in results:
+            if data is None:                                         # Request failed; already logged in _fetch_chunk
+                continue
+
+            for entry in data:                                       # Process each article
+                source = entry.get("source")                         # e.g. 'MED', 'PMC'
+                ext_id = entry.get("extId")                          # e.g. '12345678', '87654321'
+                if source and ext_id:
+                    aid = f"{source}:{ext_id}"                       # e.g. 'MED:12345678', 'PMC:87654321'
+                else:
+                    aid = ext_id or source                           # fallback if one is missing
+                # The request already scopes by type=Gene_Proteins, so the API only returns
+                # gene/protein annotations; no need to re-filter each annotation in Python.
+                out[aid] = entry.get("annotations", [])              # Store in output dictionary
     return out
\ No newline at end of file
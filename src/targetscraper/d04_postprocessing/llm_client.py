@@ -1,19 +1,92 @@
 from __future__ import annotations
 
 from typing import Dict, Any, List, Optional
+import hashlib
 import json
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from google import genai
 from google.genai import Client
 
-from .llm_prompts import build_article_prompt, build_corpus_prompt  
+from targetscraper.utils import json_loads
+
+from .llm_prompts import build_article_body, build_article_preamble, build_corpus_prompt
+
+# ---------- Persistent per-article result cache ----------
+
+_CACHE_PATH = ".llm_cache.sqlite"                                    # On-disk cache next to the HTTP cache; survives reruns
+_cache_lock = threading.Lock()                                       # Per-article calls run on a thread pool; serialize sqlite access
+_cache_conn: Optional[sqlite3.Connection] = None
+
+
+def _cache() -> sqlite3.Connection:
+    """Lazily open the sqlite cache of parsed per-article LLM results."""
+    global _cache_conn
+    if _cache_conn is None:
+        _cache_conn = sqlite3.connect(_CACHE_PATH, check_same_thread=False)
+        _cache_conn.execute("CREATE TABLE IF NOT EXISTS llm_results (key TEXT PRIMARY KEY, result TEXT)")
+        _cache_conn.commit()
+    return _cache_conn
+
+
+def _cache_key(model_id: str, prompt: str) -> str:
+    """Cache key over the full prompt and model: hashing the prompt text means any
+    change to the template, questions, target or article invalidates naturally."""
+    return hashlib.blake2b(f"{model_id}|{prompt}".encode("utf-8"), digest_size=16).hexdigest()
+
 
 # ---------- JSON parsing utility ----------
 
+def _first_json_object(text: str) -> Optional[str]:
+    """
+    Function to extract the first balanced JSON object from text in a single pass.
+    Tracks brace depth while respecting string literals and escapes, so prose or
+    fenced code around the object (or stray braces inside quoted evidence) don't
+    break extraction the way find('{')/rfind('}') slicing did.
+
+    Parameters
+    ----------
+    text : str
+        Text that may contain a JSON object.
+
+    Returns
+    -------
+    Optional[str]
+        The first balanced {...} substring, or None if no complete object exists.
+    """
+    depth = 0
+    start = -1
+    in_string = False
+    escape = False
+    for i, ch in enumerate(text):
+        if in_string:                                                    # Inside a string literal: only watch for its end
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            if depth == 0:
+                start = i                                                # First opening brace starts the capture
+            depth += 1
+        elif ch == "}" and depth > 0:
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]                                 # Balanced object complete
+    return None
+
+
 def try_parse_json(text: str) -> Dict[str, Any]:
     """
-    Function to transform LLM output text into a JSON dictionary. 
-        
+    Function to transform LLM output text into a JSON dictionary.
+
     Parameters
     ----------
     text : str
@@ -25,19 +98,145 @@ def try_parse_json(text: str) -> Dict[str, Any]:
         Parsed JSON dictionary or error information if parsing fails.
     """
     text = text.strip()                                                  # Clean up whitespace
-    if "{" in text and "}" in text:                                      # Check for valid JSON
-        candidate = text[text.find("{"): text.rfind("}") + 1]            # Extract JSON substring
-    else:
-        candidate = text                                                 # Use full text if no braces found as fallback 
+    candidate = _first_json_object(text) or text                         # Full text as fallback when no balanced object found
     try:
-        import json                                                      # Import here to avoid top-level dependency if unused
-        return json.loads(candidate)                                     # Attempt to parse JSON
+        return json_loads(candidate)                                     # Attempt to parse JSON (orjson when available)
     except Exception:
         return {"error": "Failed to parse JSON", "raw": text}            # Return error info on failure
 
 
 # ---------- LLM-facing helpers ----------
 
+# Response schemas for Gemini structured output: with response_mime_type set to
+# JSON and a schema attached, the model returns parseable JSON directly instead
+# of prose-wrapped text, removing the brace-extraction failure mode entirely.
+_CATEGORY_SCHEMA: Dict[str, Any] = {
+    "type": "OBJECT",
+    "properties": {
+        "answer": {"type": "STRING"},
+        "evidence": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "confidence": {"type": "STRING"},
+    },
+    "required": ["answer", "evidence", "confidence"],
+}
+
+ARTICLE_SCHEMA: Dict[str, Any] = {
+    "type": "OBJECT",
+    "properties": {
+        "target": {"type": "STRING"},
+        "article_id": {"type": "STRING"},
+        "overall_targets": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "disease_linkage": _CATEGORY_SCHEMA,
+        "validation_strength": _CATEGORY_SCHEMA,
+        "druggability_safety": _CATEGORY_SCHEMA,
+        "novelty_prioritization": _CATEGORY_SCHEMA,
+        "summary_score": {"type": "STRING"},
+    },
+    "required": ["target", "article_id", "disease_linkage", "validation_strength",
+                 "druggability_safety", "novelty_prioritization", "summary_score"],
+}
+
+CORPUS_SCHEMA: Dict[str, Any] = {
+    "type": "OBJECT",
+    "properties": {
+        "target": {"type": "STRING"},
+        "disease_linkage": _CATEGORY_SCHEMA,
+        "validation_strength": _CATEGORY_SCHEMA,
+        "druggability_safety": _CATEGORY_SCHEMA,
+        "novelty_prioritization": _CATEGORY_SCHEMA,
+        "summary_score": {"type": "STRING"},
+    },
+    "required": ["target", "disease_linkage", "validation_strength",
+                 "druggability_safety", "novelty_prioritization", "summary_score"],
+}
+
+
+def _parse_response(response) -> Dict[str, Any]:
+    """Prefer the SDK's already-parsed structured output; fall back to the
+    brace-matching text parser for any response without it."""
+    parsed = getattr(response, "parsed", None)
+    if isinstance(parsed, dict):
+        return parsed
+    return try_parse_json(response.text or "")
+
+
+_MAX_ATTEMPTS = 4                                                    # Attempts per model call before giving up
+_BACKOFF_BASE = 1.0                                                  # Seconds; doubled per attempt, plus jitter
+_TRANSIENT_CODES = (429, 500, 502, 503, 504)                         # Rate limits and server-side errors worth retrying
+
+
+def _generate_with_retry(
+    client: genai.Client,
+    model_id: str,
+    contents: str,
+    config: Optional[Dict[str, Any]] = None,
+):
+    """
+    Function to call generate_content with exponential backoff on transient
+    failures (rate limits, timeouts, 5xx). Non-transient errors — bad API key,
+    invalid request — raise immediately; so does the last attempt.
+    """
+    for attempt in range(_MAX_ATTEMPTS):
+        try:
+            if config is not None:
+                return client.models.generate_content(model=model_id, contents=contents, config=config)
+            return client.models.generate_content(model=model_id, contents=contents)
+        except Exception as exc:
+            code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+            transient = code in _TRANSIENT_CODES or isinstance(exc, TimeoutError)
+            if not transient or attempt == _MAX_ATTEMPTS - 1:
+                raise
+            time.sleep(_BACKOFF_BASE * (2 ** attempt) + random.uniform(0, 0.5))  # Jitter de-synchronizes the pooled workers
+
+def create_article_context_cache(
+    client: genai.Client,
+    target: str,
+    model_id: str = "gemini-2.5-flash",
+    ttl: str = "600s",
+) -> Optional[str]:
+    """
+    Function to create a server-side Gemini context cache holding the static
+    per-article preamble (instructions + questions + schema) for one target, so
+    each per-article call only pays input tokens for the article itself.
+
+    Parameters
+    ----------
+    client : genai.Client
+        The Gemini API client.
+    target : str
+        The target name the preamble is built for.
+    model_id : str
+        The Gemini model ID to use. Default is "gemini-2.5-flash
+    ttl : str
+        Cache lifetime, default "600s" — comfortably longer than one analysis run.
+
+    Returns
+    -------
+    Optional[str]
+        Cache resource name to pass as cached_content, or None when context
+        caching is unavailable (unsupported model, preamble under the minimum
+        cacheable token count, quota). Callers fall back to full prompts.
+    """
+    try:
+        cached = client.caches.create(
+            model=model_id,
+            config={"contents": [build_article_preamble(target)], "ttl": ttl},
+        )
+        return cached.name
+    except Exception:
+        return None
+
+
+def delete_article_context_cache(client: genai.Client, cache_name: Optional[str]) -> None:
+    """Best-effort deletion of a context cache created for one analysis run."""
+    if not cache_name:
+        return
+    try:
+        client.caches.delete(name=cache_name)
+    except Exception:
+        pass                                                             # TTL expiry cleans up anyway
+
+
 def llm_analyze_article_gemini(
     client: genai.Client,
     title: str,
@@ -45,11 +244,12 @@ def llm_analyze_article_gemini(
     article_id: str,
     target: str,
     model_id: str = "gemini-2.5-flash",
+    cached_content: Optional[str] = None,
 ) -> Dict[str, Any]:
 
     """
-    Function to call Gemini LLM to analyze a single article for a given target. 
-        
+    Function to call Gemini LLM to analyze a single article for a given target.
+
     Parameters
     ----------
     client : genai.Client
@@ -64,22 +264,60 @@ def llm_analyze_article_gemini(
         The target name to focus the analysis on.
     model_id : str
         The Gemini model ID to use. Default is "gemini-2.5-flash
+    cached_content : Optional[str]
+        Name of a server-side context cache holding the preamble (from
+        create_article_context_cache). When set, only the article body is sent.
 
     Returns
     -------
     Dict[str, Any]
         Parsed JSON dictionary or error information if parsing fails.
     """
-    
-    prompt = build_article_prompt(title, abstract, article_id, target)       # Build the prompt for the article
-    # Call Gemini model
-    response = client.models.generate_content(
-        model=model_id,
-        contents=prompt,
-    )
-    # Extract text from response
-    text = response.text or ""
-    return try_parse_json(text)
+
+    body = build_article_body(title, abstract, article_id)                   # Variable per-article block
+    prompt = build_article_preamble(target) + "\n" + body                    # Full prompt; also the cache identity either way
+
+    # Served from the on-disk cache when this exact prompt+model was already
+    # scored: repeat runs over the same target/articles skip the API entirely
+    key = _cache_key(model_id, prompt)
+    with _cache_lock:
+        row = _cache().execute("SELECT result FROM llm_results WHERE key = ?", (key,)).fetchone()
+    if row is not None:
+        return json.loads(row[0])
+
+    # Call Gemini model (with retry), asking for structured JSON output; with a
+    # context cache only the article body is billed as input
+    config: Dict[str, Any] = {"response_mime_type": "application/json", "response_schema": ARTICLE_SCHEMA}
+    if cached_content:
+        config["cached_content"] = cached_content
+        response = _generate_with_retry(client, model_id, body, config=config)
+    else:
+        response = _generate_with_retry(client, model_id, prompt, config=config)
+    result = _parse_response(response)
+    if "error" not in result:                                        # Never cache parse failures; retries should repay the call
+        with _cache_lock:
+            _cache().execute("INSERT OR REPLACE INTO llm_results (key, result) VALUES (?, ?)",
+                             (key, json.dumps(result)))
+            _cache().commit()
+    return result
+
+
+_AGG_CHUNK_SIZE = 20                                                     # Per-article summaries folded into one aggregation call
+_AGG_MAX_WORKERS = 4                                                     # Concurrent partial aggregations; same rate-limit posture as the per-article pool
+
+
+def _aggregate_once(
+    client: genai.Client,
+    per_article_results: List[Dict[str, Any]],
+    target: str,
+    model_id: str,
+) -> Dict[str, Any]:
+    """One corpus-level aggregation call over a bounded list of summaries."""
+    prompt = build_corpus_prompt(per_article_results, target)             # Build the prompt for corpus-level analysis
+    response = _generate_with_retry(client, model_id, prompt,             # Call Gemini model (with retry, structured output)
+                                    config={"response_mime_type": "application/json",
+                                            "response_schema": CORPUS_SCHEMA})
+    return _parse_response(response)
 
 
 def aggregate_across_articles(
@@ -90,8 +328,15 @@ def aggregate_across_articles(
 ) -> Dict[str, Any]:
 
     """
-    Function to call Gemini LLM to analyze the corpus of articles for a given target. 
-        
+    Function to call Gemini LLM to analyze the corpus of articles for a given target.
+
+    Large corpora are aggregated map-reduce style: chunks of _AGG_CHUNK_SIZE
+    summaries are folded into partial corpus results in parallel, and the
+    partials (whose evidence strings keep their article_ids) are then reduced
+    with the same prompt, recursively if there are many chunks. This bounds
+    every call's input size instead of growing one prompt linearly with the
+    corpus until it hits token limits.
+
     Parameters
     ----------
     client : genai.Client
@@ -109,11 +354,11 @@ def aggregate_across_articles(
         Parsed JSON dictionary or error information if parsing fails.
     """
 
-    prompt = build_corpus_prompt(per_article_results, target)             # Build the prompt for corpus-level analysis
-    # Call Gemini model
-    response = client.models.generate_content(
-        model=model_id,
-        contents=prompt,
-    )
-    text = response.text or ""                                           # Extract text from response
-    return try_parse_json(text) 
\ No newline at end of file
+    if len(per_article_results) > _AGG_CHUNK_SIZE:
+        chunks = [per_article_results[start:start + _AGG_CHUNK_SIZE]
+                  for start in range(0, len(per_article_results), _AGG_CHUNK_SIZE)]
+        with ThreadPoolExecutor(max_workers=min(_AGG_MAX_WORKERS, len(chunks))) as executor:
+            partials = list(executor.map(lambda c: _aggregate_once(client, c, target, model_id), chunks))
+        return aggregate_across_articles(client, partials, target, model_id)  # Reduce the partials (recursing while still too many)
+
+    return _aggregate_once(client, per_article_results, target, model_id)
\ No newline at end of file
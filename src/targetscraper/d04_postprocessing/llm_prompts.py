@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+from functools import lru_cache
+from string import Template
 from typing import Dict, List, Any
-import json
+
+from targetscraper.utils import json_dumps
 
 # ---------- Prompt metadata & questions ----------
 # These questions will be first used in per-article analysis, then in corpus-level to extract evidence for  
@@ -42,38 +45,25 @@ QUESTIONS: Dict[str, List[str]] = {
     ],
 }
 
-# ---------- Prompt builders ----------
+# QUESTIONS never changes at runtime, so the markdown block is rendered once at
+# import instead of being rebuilt with nested loops on every per-article prompt
+_QUESTIONS_BLOCK = "".join(
+    f"\n## {category.replace('_', ' ').title()}\n" + "".join(f"- {q}\n" for q in qs)
+    for category, qs in QUESTIONS.items()
+)
 
-def build_article_prompt(title: str, abstract: str, article_id: str, target: str) -> str:
-    """
-    Function to construct the per-article analysis prompt for Gemini.
-        
-    Parameters
-    ----------
-    title : str
-        Title of the article.
-    abstract : str
-        Abstract of the article.
-    article_id
-    target : str
-        Target of interest.
-
-    Returns
-    -------
-    str
-        Constructed prompt string.
-    """
-    context = f"Article ID: {article_id}\nTitle: {title}\nAbstract: {abstract}"                             # Article abstract
-    prompt = f"""You are an expert drug discovery researcher evaluating a single therapeutic target.
+# ---------- Prompt builders ----------
+# Templates are compiled once at import (string.Template leaves the JSON schema
+# braces alone, unlike f-strings which need them doubled); substituted values
+# are inserted verbatim, so article text containing '$' is safe.
 
-Target of interest: {target}
+_ARTICLE_PREAMBLE_TMPL = Template("""You are an expert drug discovery researcher evaluating a single therapeutic target.
 
-Analyze this biomedical article ONLY for information relevant to this target and the specified disease context.
+Target of interest: $target
 
-Article:
-{context}
+You will be given one biomedical article (Article ID, title and abstract). Analyze it ONLY for information relevant to this target and the specified disease context.
 
-For this article and this target:
+For the article and this target:
 
 - Answer the questions below only if the article provides evidence relevant to the target; otherwise answer "Not addressed in this article".
 - When you provide evidence, always include the article_id ("Article ID: ...") in the evidence strings so that scientists can trace back.
@@ -86,40 +76,79 @@ For each category, provide:
 Also list all gene/protein targets mentioned that are synonyms or closely related to the target of interest.
 
 Questions:
-"""                                                                                                          # End of prompt header
-    
-    for category, qs in QUESTIONS.items():
-        prompt += f"\n## {category.replace('_',' ').title()}\n"
-        for q in qs:
-            prompt += f"- {q}\n"
-                                                                                                            # End of questions
-
-    prompt += f"""                                                                                           
+""" + _QUESTIONS_BLOCK + """
 Output ONLY valid JSON in this exact schema:
-{{
-  "target": "{target}",
-  "article_id": "{article_id}",
+{
+  "target": "$target",
+  "article_id": "<the Article ID exactly as given>",
   "overall_targets": ["gene1", "gene2"],
-  "disease_linkage": {{"answer": "...", "evidence": ["..."], "confidence": "High"}},
-  "validation_strength": {{"answer": "...", "evidence": ["..."], "confidence": "Medium"}},
-  "druggability_safety": {{"answer": "...", "evidence": ["..."], "confidence": "Low"}},
-  "novelty_prioritization": {{"answer": "...", "evidence": ["..."], "confidence": "Medium"}},
+  "disease_linkage": {"answer": "...", "evidence": ["..."], "confidence": "High"},
+  "validation_strength": {"answer": "...", "evidence": ["..."], "confidence": "Medium"},
+  "druggability_safety": {"answer": "...", "evidence": ["..."], "confidence": "Low"},
+  "novelty_prioritization": {"answer": "...", "evidence": ["..."], "confidence": "Medium"},
   "summary_score": "High/Medium/Low priority target"
-}}
+}
 Do not include any text before or after the JSON.
-"""
-    return prompt
+""")
 
+_ARTICLE_BODY_TMPL = Template("Article:\nArticle ID: $article_id\nTitle: $title\nAbstract: $abstract")
 
 
-def build_corpus_prompt(per_article_results: list[Dict[str, Any]], target: str) -> str:
+@lru_cache(maxsize=32)
+def build_article_preamble(target: str) -> str:
     """
-    Function to construct the corpus-level aggregation prompt for Gemini.
-        
+    Function to construct the static portion of the per-article prompt: instructions,
+    questions and output schema. Identical for every article of a target, which is
+    what makes it cacheable server-side via Gemini context caching; memoized per
+    target so per-article calls don't re-render the multi-KB block.
+
     Parameters
     ----------
-    per_article_results : list[Dict[str, Any]]
-        List of per-article results.
+    target : str
+        Target of interest.
+
+    Returns
+    -------
+    str
+        Constructed preamble string.
+    """
+    return _ARTICLE_PREAMBLE_TMPL.substitute(target=target)
+
+
+def build_article_body(title: str, abstract: str, article_id: str) -> str:
+    """
+    Function to construct the variable, per-article portion of the prompt.
+
+    Parameters
+    ----------
+    title : str
+        Title of the article.
+    abstract : str
+        Abstract of the article.
+    article_id : str
+        Unique identifier for the article.
+
+    Returns
+    -------
+    str
+        Constructed article block string.
+    """
+    return _ARTICLE_BODY_TMPL.substitute(article_id=article_id, title=title, abstract=abstract)
+
+
+def build_article_prompt(title: str, abstract: str, article_id: str, target: str) -> str:
+    """
+    Function to construct the full per-article analysis prompt for Gemini
+    (preamble + article body), used when context caching is unavailable.
+
+    Parameters
+    ----------
+    title : str
+        Title of the article.
+    abstract : str
+        Abstract of the article.
+    article_id : str
+        Unique identifier for the article.
     target : str
         Target of interest.
 
@@ -128,12 +157,14 @@ def build_corpus_prompt(per_article_results: list[Dict[str, Any]], target: str)
     str
         Constructed prompt string.
     """
-    corpus_json = json.dumps(per_article_results, indent=2)   # Convert list of article results to JSON string
-# Build the prompt for the corpus-level analysis based on outputs analysis and prompt from individual articles above
-    prompt = f"""
+    return build_article_preamble(target) + "\n" + build_article_body(title, abstract, article_id)
+
+
+
+_CORPUS_TMPL = Template("""
 You are an expert drug discovery researcher assessing the completeness of evidence for a single target.
 
-Target of interest: {target}
+Target of interest: $target
 
 You are given structured per-article summaries (JSON list). Each entry contains:
 - article_id
@@ -142,7 +173,7 @@ You are given structured per-article summaries (JSON list). Each entry contains:
 - a summary_score for that article
 
 Per-article summaries:
-{corpus_json}
+$corpus_json
 
 Using ALL articles together, answer these questions for this target at the corpus level:
 
@@ -154,14 +185,34 @@ For each category (disease_linkage, validation_strength, druggability_safety, no
 Then provide an overall summary_score for this target (High/Medium/Low priority) and a brief justification.
 
 Output ONLY valid JSON in this exact schema:
-{{
-  "target": "{target}",
-  "disease_linkage": {{"answer": "...", "evidence": ["..."], "confidence": "High"}},
-  "validation_strength": {{"answer": "...", "evidence": ["..."], "confidence": "Medium"}},
-  "druggability_safety": {{"answer": "...", "evidence": ["..."], "confidence": "Low"}},
-  "novelty_prioritization": {{"answer": "...", "evidence": ["..."], "confidence": "Medium"}},
+{
+  "target": "$target",
+  "disease_linkage": {"answer": "...", "evidence": ["..."], "confidence": "High"},
+  "validation_strength": {"answer": "...", "evidence": ["..."], "confidence": "Medium"},
+  "druggability_safety": {"answer": "...", "evidence": ["..."], "confidence": "Low"},
+  "novelty_prioritization": {"answer": "...", "evidence": ["..."], "confidence": "Medium"},
   "summary_score": "High/Medium/Low priority target"
-}}
+}
 Do not include any text before or after the JSON.
-"""
-    return prompt
\ No newline at end of file
+""")
+
+
+def build_corpus_prompt(per_article_results: list[Dict[str, Any]], target: str) -> str:
+    """
+    Function to construct the corpus-level aggregation prompt for Gemini.
+        
+    Parameters
+    ----------
+    per_article_results : list[Dict[str, Any]]
+        List of per-article results.
+    target : str
+        Target of interest.
+
+    Returns
+    -------
+    str
+        Constructed prompt string.
+    """
+    corpus_json = json_dumps(per_article_results)             # Compact JSON: the model parses it identically and indentation only bills whitespace tokens
+# Build the prompt for the corpus-level analysis based on outputs analysis and prompt from individual articles above
+    return _CORPUS_TMPL.substitute(target=target, corpus_json=corpus_json)